@@ -1,10 +1,20 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, BackgroundTasks, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from datetime import datetime, timedelta
-import json
+from datetime import datetime, timedelta, timezone
+import base64
+import hashlib
+import heapq
+import hmac
+import mmap
 import os
+import threading
+import time
 import bcrypt
-import jwt
+import orjson
+from apscheduler.schedulers.background import BackgroundScheduler
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # Path untuk kredensial admin
@@ -14,15 +24,26 @@ load_dotenv(env_path)
 ADMIN_USER_ID = os.getenv("ADMIN_USER_ID")
 ADMIN_PASSWORD_HASH = os.getenv("ADMIN_PASSWORD")
 
+# Encode kredensial sekali saat import, bukan di setiap login
+_ADMIN_USER = ADMIN_USER_ID or ""
+_ADMIN_HASH_BYTES = ADMIN_PASSWORD_HASH.encode() if ADMIN_PASSWORD_HASH else b""
+
 SECRET_KEY = "supersecretkey"
-ALGORITHM = "HS256"
 TOKEN_EXPIRATION_MINUTES = 60
 
-app = FastAPI()
+# Header JWT tidak pernah berubah; encode sekali saat import
+_SECRET_BYTES = SECRET_KEY.encode()
+_JWT_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+# Serialisasi response lewat orjson, lebih cepat dari json bawaan
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Path untuk menyimpan database
 DB_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data/articles_db.json"))
 
+# Sentinel "tidak pernah unpublish", dihitung sekali saat import
+_NEVER_UNPUBLISH_ISO = datetime(2099, 12, 31).isoformat()
+
 # Model untuk artikel
 class Article(BaseModel):
     id: str
@@ -48,102 +69,310 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-# Fungsi membaca database
+# Cache database di memori supaya tidak parse ulang JSON di setiap request
+_articles_cache = None
+_articles_lock = threading.RLock()
+
+# Index artikel berdasarkan id supaya lookup jadi O(1), bukan scan
+_id_index = {}
+
+# Daftar artikel published, dijaga saat mutasi supaya GET tidak perlu scan
+_published = []
+
+# Response /articles yang sudah diserialisasi; None berarti perlu dibangun ulang
+_published_bytes = None
+
+def _invalidate_published_bytes():
+    global _published_bytes
+    _published_bytes = None
+
+# Min-heap event (publish_at/unpublish_at, id, artikel) supaya scheduler
+# hanya memproses event yang jatuh tempo, bukan scan seluruh database
+_pub_heap = []
+_unpub_heap = []
+
+# Normalisasi datetime ke UTC naive supaya bisa dibandingkan dengan utcnow()
+def _to_naive_utc(ts):
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _parse_ts(value):
+    return _to_naive_utc(datetime.fromisoformat(value))
+
+def _schedule_publish(article):
+    heapq.heappush(_pub_heap, (_parse_ts(article["publish_at"]), article["id"], article))
+
+def _schedule_unpublish(article):
+    heapq.heappush(_unpub_heap, (_parse_ts(article["unpublish_at"]), article["id"], article))
+
+def _rebuild_indexes():
+    now = datetime.utcnow()
+    changed = False
+    _id_index.clear()
+    _published.clear()
+    _pub_heap.clear()
+    _unpub_heap.clear()
+    for article in _articles_cache:
+        _id_index[article["id"]] = article
+        # Jadwal publish yang jatuh tempo selagi proses mati diterapkan
+        # saat load, jangan sampai hilang
+        if article.get("scheduled_publish") and article["status"] != "published" and _parse_ts(article["publish_at"]) <= now:
+            article["status"] = "published"
+            article["unpublish_at"] = _NEVER_UNPUBLISH_ISO
+            article.pop("scheduled_publish", None)
+            changed = True
+        if article["status"] == "published":
+            _published.append(article)
+            _schedule_unpublish(article)
+        elif article.get("scheduled_publish"):
+            _schedule_publish(article)
+    _invalidate_published_bytes()
+    return changed
+
+# Fungsi membaca database (lazy, hanya parse file sekali)
 def load_articles():
-    if not os.path.exists(DB_FILE):
-        return []
-    with open(DB_FILE, "r") as f:
-        return json.load(f)
+    global _articles_cache
+    with _articles_lock:
+        if _articles_cache is None:
+            if not os.path.exists(DB_FILE) or os.path.getsize(DB_FILE) == 0:
+                _articles_cache = []
+            else:
+                # mmap file lalu parse langsung dari page cache, tanpa
+                # salinan ekstra kernel -> buffer userspace
+                fd = os.open(DB_FILE, os.O_RDONLY)
+                try:
+                    mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+                    try:
+                        view = memoryview(mm)
+                        try:
+                            _articles_cache = orjson.loads(view)
+                        finally:
+                            view.release()
+                    finally:
+                        mm.close()
+                finally:
+                    os.close(fd)
+            if _rebuild_indexes():
+                save_articles(_articles_cache)
+        return _articles_cache
 
 # Fungsi menyimpan database
 def save_articles(articles):
-    with open(DB_FILE, "w") as f:
-        json.dump(articles, f, indent=4)
+    global _articles_cache
+    with _articles_lock:
+        _articles_cache = articles
+        # Serialisasi ke satu buffer lalu tulis dengan satu syscall,
+        # tanpa lewat BufferedWriter
+        buf = orjson.dumps(articles, option=orjson.OPT_INDENT_2)
+        fd = os.open(DB_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, buf)
+        finally:
+            os.close(fd)
+
+# Job scheduler: proses hanya event yang sudah jatuh tempo dari heap
+def check_article_status():
+    with _articles_lock:
+        now = datetime.utcnow()
+        changed = False
+        while _pub_heap and _pub_heap[0][0] <= now:
+            ts, _, article = heapq.heappop(_pub_heap)
+            if article["status"] != "published" and _parse_ts(article["publish_at"]) == ts:
+                article["status"] = "published"
+                article["unpublish_at"] = _NEVER_UNPUBLISH_ISO
+                article.pop("scheduled_publish", None)
+                _published.append(article)
+                _schedule_unpublish(article)
+                changed = True
+        while _unpub_heap and _unpub_heap[0][0] <= now:
+            ts, _, article = heapq.heappop(_unpub_heap)
+            if article["status"] == "published" and _parse_ts(article["unpublish_at"]) == ts:
+                article["status"] = "unpublished"
+                _published.remove(article)
+                changed = True
+        if changed:
+            _invalidate_published_bytes()
+            save_articles(_articles_cache)
 
-# Fungsi membuat JWT token
+scheduler = BackgroundScheduler()
+
+# Fungsi membuat JWT token (susun manual dengan header yang sudah di-cache,
+# hasilnya identik dengan jwt.encode tapi tanpa rebuild header per panggilan)
 def create_token(username: str):
     expiration = datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRATION_MINUTES)
-    payload = {"sub": username, "exp": expiration}
-    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    exp = int(expiration.replace(tzinfo=timezone.utc).timestamp())
+    payload_b64 = base64.urlsafe_b64encode(orjson.dumps({"sub": username, "exp": exp})).rstrip(b"=")
+    signing_input = _JWT_HEADER_B64 + b"." + payload_b64
+    signature = hmac.new(_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + base64.urlsafe_b64encode(signature).rstrip(b"=")).decode()
+
+# Cache login sukses (key = hash kredensial) supaya login berulang dalam
+# 30 detik tidak mengulang bcrypt ~100ms. Login gagal tidak pernah dicache.
+_login_cache = TTLCache(maxsize=1024, ttl=30)
+_login_cache_lock = threading.RLock()
 
 # Middleware untuk verifikasi admin
 def verify_admin(username: str, password: str):
-    if username != ADMIN_USER_ID or not bcrypt.checkpw(password.encode(), ADMIN_PASSWORD_HASH.encode()):
+    # Cek username dulu (constant-time) supaya tidak buang ~100ms bcrypt
+    # untuk percobaan enumerasi username
+    if not hmac.compare_digest(username.encode(), _ADMIN_USER.encode()):
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    key = hashlib.sha256((username + ":" + password).encode()).digest()
+    with _login_cache_lock:
+        if key in _login_cache:
+            return True
+    if not bcrypt.checkpw(password.encode(), _ADMIN_HASH_BYTES):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    with _login_cache_lock:
+        _login_cache[key] = True
     return True
 
+# Cache hasil verifikasi JWT (key = hash token, bukan token mentah)
+_jwt_cache = TTLCache(maxsize=10_000, ttl=5)
+_jwt_cache_lock = threading.RLock()
+
+# Verifikasi token HS256 langsung lewat primitive hmac/hashlib — jauh lebih
+# ringan daripada jwt.decode yang parse header + lookup algoritma per panggilan
+def _verify_hs256(token: str):
+    try:
+        header_b64, payload_b64, sig_b64 = token.split(".")
+        signing_input = (header_b64 + "." + payload_b64).encode()
+        expected = hmac.new(_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, base64.urlsafe_b64decode(sig_b64 + "==")):
+            raise ValueError("bad signature")
+        payload = orjson.loads(base64.urlsafe_b64decode(payload_b64 + "=="))
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("exp", 0) <= time.time():
+        raise HTTPException(status_code=401, detail="Token expired")
+    return payload
+
 # Middleware untuk autentikasi token
 def get_current_admin(authorization: str = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
 
     token = authorization.split(" ")[1]
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
-    except jwt.ExpiredSignatureError:
+
+    # Cek cache dulu supaya tidak perlu verifikasi token di setiap request
+    key = hashlib.sha256(token.encode()).digest()
+    with _jwt_cache_lock:
+        cached = _jwt_cache.get(key)
+    if cached is not None:
+        sub, exp = cached
+        if time.time() < exp:
+            return sub
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+
+    payload = _verify_hs256(token)
+    with _jwt_cache_lock:
+        _jwt_cache[key] = (payload["sub"], payload["exp"])
+    return payload["sub"]
+
+# Muat database sekali saat aplikasi mulai, lalu jalankan scheduler
+@app.on_event("startup")
+def load_articles_on_startup():
+    load_articles()
+    scheduler.add_job(check_article_status, "interval", seconds=60)
+    scheduler.start()
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    scheduler.shutdown(wait=False)
 
 # Endpoint login (Menghasilkan token)
 @app.post("/login")
-def login(login_data: LoginRequest):
-    verify_admin(login_data.username, login_data.password)
+async def login(login_data: LoginRequest):
+    # bcrypt ~100ms per cek; jalankan di threadpool supaya event loop
+    # tetap bisa melayani request lain selama verifikasi
+    await run_in_threadpool(verify_admin, login_data.username, login_data.password)
     token = create_token(login_data.username)
     return {"access_token": token}
 
 # Endpoint mendapatkan artikel yang dipublish (tanpa autentikasi)
 @app.get("/articles")
 def get_articles():
-    articles = load_articles()
-    published_articles = [a for a in articles if a["status"] == "published"]
-    return published_articles
+    global _published_bytes
+    load_articles()
+    # Sajikan bytes yang sudah diserialisasi; bangun ulang hanya setelah mutasi
+    if _published_bytes is None:
+        with _articles_lock:
+            if _published_bytes is None:
+                _published_bytes = orjson.dumps(_published)
+    return Response(content=_published_bytes, media_type="application/json")
 
 # Endpoint menambahkan artikel (Perlu autentikasi)
 @app.post("/articles")
-def add_article(article: CreateArticleRequest, username: str = Depends(get_current_admin)):
-    articles = load_articles()
-    article_id = str(len(articles) + 1)
-
-    if article.status == "published":
-        publish_at = article.publish_at or datetime.utcnow()
-        unpublish_at = publish_at + timedelta(days=36500)  # 100 tahun
-    else:
-        publish_at = datetime.utcnow()
-        unpublish_at = datetime.utcnow()
-
-    new_article = {
-        "id": article_id,
-        "title": article.title,
-        "url": article.url,
-        "status": article.status,
-        "publish_at": publish_at.isoformat(),
-        "unpublish_at": unpublish_at.isoformat()
-    }
-
-    articles.append(new_article)
-    save_articles(articles)
+def add_article(article: CreateArticleRequest, background: BackgroundTasks, username: str = Depends(get_current_admin)):
+    # Handler jalan di threadpool; kunci supaya tidak balapan dengan
+    # handler lain atau job scheduler saat memutasi cache dan index
+    with _articles_lock:
+        articles = load_articles()
+        article_id = str(len(articles) + 1)
+
+        now = datetime.utcnow()
+        publish_at = _to_naive_utc(article.publish_at) if article.publish_at else now
+        if article.status == "published":
+            unpublish_at_iso = _NEVER_UNPUBLISH_ISO
+        else:
+            unpublish_at_iso = now.isoformat()
+
+        new_article = {
+            "id": article_id,
+            "title": article.title,
+            "url": article.url,
+            "status": article.status,
+            "publish_at": publish_at.isoformat(),
+            "unpublish_at": unpublish_at_iso
+        }
+
+        articles.append(new_article)
+        _id_index[article_id] = new_article
+        if new_article["status"] == "published":
+            _published.append(new_article)
+            _schedule_unpublish(new_article)
+        elif article.publish_at:
+            # Tandai eksplisit supaya jadwal publish selamat dari restart
+            new_article["scheduled_publish"] = True
+            _schedule_publish(new_article)
+        _invalidate_published_bytes()
+    # Tulis ke disk setelah response terkirim, jangan blokir client
+    background.add_task(save_articles, articles)
     return new_article
 
 # Endpoint update artikel (Perlu autentikasi)
 @app.put("/articles/{article_id}")
-def update_article(article_id: str, update_data: UpdateArticleRequest, username: str = Depends(get_current_admin)):
-    articles = load_articles()
-    for article in articles:
-        if article["id"] == article_id:
-            if update_data.title:
-                article["title"] = update_data.title
-            if update_data.url:
-                article["url"] = update_data.url
-            if update_data.status:
-                article["status"] = update_data.status
-                if update_data.status == "published":
-                    article["publish_at"] = (update_data.publish_at or datetime.utcnow()).isoformat()
-                    article["unpublish_at"] = (datetime.utcnow() + timedelta(days=36500)).isoformat()
-                else:
-                    article["unpublish_at"] = datetime.utcnow().isoformat()
-            save_articles(articles)
-            return article
-
-    raise HTTPException(status_code=404, detail="Article not found")
+def update_article(article_id: str, update_data: UpdateArticleRequest, background: BackgroundTasks, username: str = Depends(get_current_admin)):
+    with _articles_lock:
+        articles = load_articles()
+        article = _id_index.get(article_id)
+        if article is None:
+            raise HTTPException(status_code=404, detail="Article not found")
+
+        if update_data.title:
+            article["title"] = update_data.title
+        if update_data.url:
+            article["url"] = update_data.url
+        if update_data.status:
+            now = datetime.utcnow()
+            was_published = article["status"] == "published"
+            article["status"] = update_data.status
+            if update_data.status == "published":
+                article["publish_at"] = (_to_naive_utc(update_data.publish_at) if update_data.publish_at else now).isoformat()
+                article["unpublish_at"] = _NEVER_UNPUBLISH_ISO
+                article.pop("scheduled_publish", None)
+                if not was_published:
+                    _published.append(article)
+                _schedule_unpublish(article)
+            else:
+                article["unpublish_at"] = now.isoformat()
+                if was_published:
+                    _published.remove(article)
+                if update_data.publish_at:
+                    article["publish_at"] = _to_naive_utc(update_data.publish_at).isoformat()
+                    article["scheduled_publish"] = True
+                    _schedule_publish(article)
+        _invalidate_published_bytes()
+    background.add_task(save_articles, articles)
+    return article